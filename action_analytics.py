@@ -0,0 +1,464 @@
+# action_analytics.py
+import hashlib
+import math
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from action_sense import detect_urgency
+
+DIMENSIONS = ("action_type", "platform", "delay_bucket", "urgency")
+# Free-form values outside these sets are folded into "other" to keep memory fixed
+KNOWN_ACTION_TYPES = ("respond", "ignore", "schedule")
+KNOWN_PLATFORMS = ("whatsapp", "email", "slack")
+
+
+# ---------- HASHING ----------
+def _hash64(value: str, seed: int = 0) -> int:
+    """
+    Stable 64-bit hash (Python's hash() is salted per process, so shards would disagree).
+    """
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8, salt=seed.to_bytes(16, "little")).digest()
+    return int.from_bytes(digest, "little")
+
+
+# ---------- COUNT-MIN SKETCH ----------
+class CountMinSketch:
+    """
+    Fixed-size frequency estimator. Estimates never undercount; overcount is
+    bounded by roughly total / width with high probability.
+    """
+
+    def __init__(self, width: int = 1024, depth: int = 4):
+        if width <= 0 or depth <= 0:
+            raise ValueError("width and depth must be positive.")
+        self.width = width
+        self.depth = depth
+        self.table = [[0] * width for _ in range(depth)]
+
+    def _cells(self, key: str):
+        for row in range(self.depth):
+            yield row, _hash64(key, row) % self.width
+
+    def add(self, key: str, count: int = 1) -> None:
+        for row, col in self._cells(key):
+            self.table[row][col] += count
+
+    def estimate(self, key: str) -> int:
+        return min(self.table[row][col] for row, col in self._cells(key))
+
+    def check_compatible(self, other: "CountMinSketch") -> None:
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Cannot merge Count-Min sketches with different dimensions.")
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        self.check_compatible(other)
+        for mine, theirs in zip(self.table, other.table):
+            for i, value in enumerate(theirs):
+                mine[i] += value
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"width": self.width, "depth": self.depth, "table": [list(row) for row in self.table]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CountMinSketch":
+        sketch = cls(data["width"], data["depth"])
+        table = data["table"]
+        if len(table) != sketch.depth or any(len(row) != sketch.width for row in table):
+            raise ValueError("Count-Min table does not match width/depth.")
+        sketch.table = [list(row) for row in table]
+        return sketch
+
+
+# ---------- HYPERLOGLOG ----------
+class HyperLogLog:
+    """
+    Distinct-count estimator using 2**precision one-byte registers
+    (standard error ~ 1.04 / sqrt(2**precision)).
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16.")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value: str) -> None:
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        # Rank = position of the leftmost 1-bit in the remaining bits
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = self.m
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def check_compatible(self, other: "HyperLogLog") -> None:
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision.")
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.check_compatible(other)
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"precision": self.precision, "registers": self.registers.hex()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        hll = cls(data["precision"])
+        registers = bytearray.fromhex(data["registers"])
+        if len(registers) != hll.m:
+            raise ValueError("HyperLogLog registers do not match precision.")
+        hll.registers = registers
+        return hll
+
+
+# ---------- SLIDING WINDOW COUNTER ----------
+class SlidingWindowCounter:
+    """
+    Ring of time buckets aligned to the epoch, so buckets from different
+    workers line up and can be merged slot by slot.
+    """
+
+    def __init__(self, window_seconds: int = 3600, bucket_seconds: int = 60):
+        if bucket_seconds <= 0 or window_seconds < bucket_seconds:
+            raise ValueError("window_seconds must be >= bucket_seconds > 0.")
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = math.ceil(window_seconds / bucket_seconds)
+        # Each slot holds (bucket_index, Counter); bucket_index -1 means empty
+        self.slots: List[Tuple[int, Counter]] = [(-1, Counter()) for _ in range(self.num_buckets)]
+        self.latest_bucket = -1
+
+    def _slot_for(self, bucket: int) -> Counter:
+        pos = bucket % self.num_buckets
+        index, counts = self.slots[pos]
+        if index != bucket:
+            counts = Counter()
+            self.slots[pos] = (bucket, counts)
+        return counts
+
+    def add(self, key: str, timestamp: float, count: int = 1) -> None:
+        bucket = int(timestamp // self.bucket_seconds)
+        if bucket <= self.latest_bucket - self.num_buckets:
+            return  # older than the window, drop
+        self.latest_bucket = max(self.latest_bucket, bucket)
+        self._slot_for(bucket)[key] += count
+
+    def counts(self, now: Optional[float] = None) -> Counter:
+        """
+        Totals over the window ending at `now` (defaults to the newest event seen).
+        """
+        latest = self.latest_bucket if now is None else int(now // self.bucket_seconds)
+        oldest = latest - self.num_buckets + 1
+        total = Counter()
+        for index, counts in self.slots:
+            if oldest <= index <= latest:
+                total.update(counts)
+        return total
+
+    @property
+    def latest_timestamp(self) -> Optional[float]:
+        """
+        Start of the newest bucket seen, or None before any event.
+        """
+        return None if self.latest_bucket < 0 else float(self.latest_bucket * self.bucket_seconds)
+
+    def check_compatible(self, other: "SlidingWindowCounter") -> None:
+        if (self.bucket_seconds, self.num_buckets) != (other.bucket_seconds, other.num_buckets):
+            raise ValueError("Cannot merge sliding windows with different configurations.")
+
+    def merge(self, other: "SlidingWindowCounter") -> "SlidingWindowCounter":
+        self.check_compatible(other)
+        self.latest_bucket = max(self.latest_bucket, other.latest_bucket)
+        oldest = self.latest_bucket - self.num_buckets + 1
+        for pos, (their_index, their_counts) in enumerate(other.slots):
+            my_index, my_counts = self.slots[pos]
+            if their_index < oldest or their_index < my_index:
+                continue
+            if their_index == my_index:
+                my_counts.update(their_counts)
+            else:
+                self.slots[pos] = (their_index, Counter(their_counts))
+        # Drop our own slots that fell out of the merged window
+        for pos, (my_index, _) in enumerate(self.slots):
+            if my_index < oldest:
+                self.slots[pos] = (-1, Counter())
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "latest_bucket": self.latest_bucket,
+            "slots": [[index, dict(counts)] for index, counts in self.slots],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SlidingWindowCounter":
+        window = cls(data["window_seconds"], data["bucket_seconds"])
+        if len(data["slots"]) != window.num_buckets:
+            raise ValueError("Sliding window slots do not match window/bucket size.")
+        window.latest_bucket = data["latest_bucket"]
+        window.slots = [(index, Counter(counts)) for index, counts in data["slots"]]
+        return window
+
+
+# ---------- DECISION FIELDS ----------
+def delay_bucket(delay_minutes: int) -> str:
+    """
+    Coarse delay bucket used as an aggregation dimension.
+    """
+    if delay_minutes <= 0:
+        return "immediate"
+    elif delay_minutes <= 30:
+        return "<=30m"
+    elif delay_minutes <= 60:
+        return "<=60m"
+    else:
+        return ">60m"
+
+
+def _parse_timestamp(raw: Any) -> Optional[float]:
+    """
+    Event time as epoch seconds: accepts ISO-8601 strings or numeric epochs.
+    Returns None for missing or unparseable values.
+    """
+    if isinstance(raw, bool):
+        return None
+    if isinstance(raw, (int, float)):
+        return float(raw) if math.isfinite(raw) else None
+    if isinstance(raw, str) and raw:
+        try:
+            parsed = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def _bounded(value: Any, known: Tuple[str, ...]) -> str:
+    value = str(value).lower()
+    return value if value in known else "other"
+
+
+# ---------- DECISION AGGREGATOR ----------
+class DecisionAggregator:
+    """
+    Incremental, fixed-memory aggregates over (input, decision) pairs coming
+    out of action_pipeline. Snapshots are JSON-serialisable and mergeable
+    across sharded workers that share the same configuration.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = 3600,
+        bucket_seconds: int = 60,
+        cms_width: int = 1024,
+        cms_depth: int = 4,
+        hll_precision: int = 12,
+        top_k: int = 5,
+        max_contexts: int = 100,
+    ):
+        self.top_k = top_k
+        self.max_contexts = max_contexts
+        self.total = 0
+        self.totals: Counter = Counter()
+        self.window = SlidingWindowCounter(window_seconds, bucket_seconds)
+        self.summaries = CountMinSketch(cms_width, cms_depth)
+        self.users = HyperLogLog(hll_precision)
+        # task_context -> {summary: estimated count}, at most top_k entries each
+        self.top_summaries: Dict[str, Dict[str, int]] = {}
+
+    def record(self, input_data: dict, output: dict) -> None:
+        """
+        Fold a single decision into the aggregates.
+        """
+        summary = input_data.get("summary", "")
+        response_format = output.get("response_format", {})
+        try:
+            delay_minutes = int(response_format.get("delay", 0))
+        except (TypeError, ValueError):
+            delay_minutes = 0
+        values = {
+            "action_type": _bounded(output.get("action_type"), KNOWN_ACTION_TYPES),
+            "platform": _bounded(response_format.get("platform", input_data.get("platform")), KNOWN_PLATFORMS),
+            "delay_bucket": delay_bucket(delay_minutes),
+            "urgency": "urgent" if detect_urgency(summary) else "normal",
+        }
+        # Stay on event time: records without a usable timestamp are placed at
+        # the newest event seen, and skip the window if nothing has been seen yet
+        timestamp = _parse_timestamp(input_data.get("timestamp"))
+        if timestamp is None:
+            timestamp = self.window.latest_timestamp
+
+        self.total += 1
+        for dimension, value in values.items():
+            key = f"{dimension}:{value}"
+            self.totals[key] += 1
+            if timestamp is not None:
+                self.window.add(key, timestamp)
+
+        user_id = input_data.get("user_id")
+        if user_id:
+            self.users.add(str(user_id))
+
+        task_context = input_data.get("task_context")
+        if task_context and summary:
+            summary_key = f"{task_context}\x00{summary}"
+            self.summaries.add(summary_key)
+            self._offer_summary(task_context, summary, self.summaries.estimate(summary_key))
+
+    def _offer_summary(self, task_context: str, summary: str, estimate: int) -> None:
+        candidates = self.top_summaries.get(task_context)
+        if candidates is None:
+            if len(self.top_summaries) >= self.max_contexts:
+                return  # context table full; still counted in the sketch
+            candidates = self.top_summaries[task_context] = {}
+        if summary in candidates or len(candidates) < self.top_k:
+            candidates[summary] = estimate
+            return
+        weakest = min(candidates, key=candidates.get)
+        if estimate > candidates[weakest]:
+            del candidates[weakest]
+            candidates[summary] = estimate
+
+    # ---------- QUERIES ----------
+    def counts(self, dimension: str, windowed: bool = True, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Counts for one of DIMENSIONS, over the sliding window or all time.
+        """
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        source = self.window.counts(now) if windowed else self.totals
+        prefix = f"{dimension}:"
+        return {key[len(prefix):]: n for key, n in source.items() if key.startswith(prefix)}
+
+    def distinct_users(self) -> int:
+        return self.users.count()
+
+    def top_summaries_for(self, task_context: str) -> List[Tuple[str, int]]:
+        candidates = self.top_summaries.get(task_context, {})
+        return sorted(candidates.items(), key=lambda item: (-item[1], item[0]))
+
+    def report(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Human-readable summary of the current aggregates.
+        """
+        return {
+            "total_decisions": self.total,
+            "distinct_users": self.distinct_users(),
+            "window": {dim: self.counts(dim, True, now) for dim in DIMENSIONS},
+            "all_time": {dim: self.counts(dim, False) for dim in DIMENSIONS},
+            "top_summaries": {ctx: self.top_summaries_for(ctx) for ctx in sorted(self.top_summaries)},
+        }
+
+    # ---------- SNAPSHOT / MERGE ----------
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "top_k": self.top_k,
+            "max_contexts": self.max_contexts,
+            "total": self.total,
+            "totals": dict(self.totals),
+            "window": self.window.to_dict(),
+            "summaries": self.summaries.to_dict(),
+            "users": self.users.to_dict(),
+            "top_summaries": {ctx: dict(c) for ctx, c in self.top_summaries.items()},
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> "DecisionAggregator":
+        agg = cls(top_k=data["top_k"], max_contexts=data["max_contexts"])
+        agg.total = data["total"]
+        agg.totals = Counter(data["totals"])
+        agg.window = SlidingWindowCounter.from_dict(data["window"])
+        agg.summaries = CountMinSketch.from_dict(data["summaries"])
+        agg.users = HyperLogLog.from_dict(data["users"])
+        agg.top_summaries = {ctx: dict(c) for ctx, c in data["top_summaries"].items()}
+        return agg
+
+    def merge(self, other: "DecisionAggregator") -> "DecisionAggregator":
+        """
+        Fold another worker's aggregates into this one. All compatibility
+        checks run before anything is modified.
+        """
+        if (self.top_k, self.max_contexts) != (other.top_k, other.max_contexts):
+            raise ValueError("Cannot merge aggregators with different top_k/max_contexts.")
+        self.window.check_compatible(other.window)
+        self.summaries.check_compatible(other.summaries)
+        self.users.check_compatible(other.users)
+
+        self.total += other.total
+        self.totals.update(other.totals)
+        self.window.merge(other.window)
+        self.summaries.merge(other.summaries)
+        self.users.merge(other.users)
+        # Re-rank the union of candidates against the merged sketch
+        merged = {}
+        for ctx in list(self.top_summaries) + [c for c in other.top_summaries if c not in self.top_summaries]:
+            candidates = set(self.top_summaries.get(ctx, {})) | set(other.top_summaries.get(ctx, {}))
+            ranked = sorted(
+                ((s, self.summaries.estimate(f"{ctx}\x00{s}")) for s in candidates),
+                key=lambda item: (-item[1], item[0]),
+            )
+            merged[ctx] = dict(ranked[: self.top_k])
+        # Existing contexts keep their place; new ones fill the free slots in a
+        # deterministic order (heaviest total estimate first, then by name)
+        new_contexts = sorted(
+            (ctx for ctx in merged if ctx not in self.top_summaries),
+            key=lambda ctx: (-sum(merged[ctx].values()), ctx),
+        )
+        free = max(self.max_contexts - len(self.top_summaries), 0)
+        self.top_summaries = {ctx: merged[ctx] for ctx in self.top_summaries}
+        for ctx in new_contexts[:free]:
+            self.top_summaries[ctx] = merged[ctx]
+        return self
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> DecisionAggregator:
+    """
+    Combine snapshots from sharded workers into a single aggregator.
+    """
+    merged = None
+    for snap in snapshots:
+        agg = DecisionAggregator.from_snapshot(snap)
+        merged = agg if merged is None else merged.merge(agg)
+    if merged is None:
+        raise ValueError("No snapshots to merge.")
+    return merged
+
+
+# ---------- TEST EXAMPLE ----------
+if __name__ == "__main__":
+    import json
+    from action_sense import decide_action
+
+    with open("test_data.json", "r") as f:
+        inputs = json.load(f)
+
+    aggregator = DecisionAggregator()
+    for input_item in inputs:
+        aggregator.record(input_item, decide_action(input_item))
+    print(json.dumps(aggregator.report(), indent=2))
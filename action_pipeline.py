@@ -2,11 +2,15 @@
 from action_sense import decide_action
 import json
 
-def action_pipeline(input_data: dict) -> dict:
+def action_pipeline(input_data: dict, aggregator=None) -> dict:
     """
     Full pipeline: take input JSON, decide action, return structured output.
+    If an aggregator (action_analytics.DecisionAggregator) is given, the
+    decision is also folded into its running aggregates.
     """
     output = decide_action(input_data)
+    if aggregator is not None:
+        aggregator.record(input_data, output)
     return output
 
 # ---------- TEST PIPELINE ----------
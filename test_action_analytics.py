@@ -0,0 +1,246 @@
+# test_action_analytics.py
+import json
+import importlib
+
+import pytest
+
+action_analytics = importlib.import_module("action_analytics")
+action_pipeline = importlib.import_module("action_pipeline")
+
+# ---- Helpers ----
+def _base_input(**overrides):
+    base = {
+        "user_id": "abc123",
+        "summary": "User is asking if the pitch deck is finalized.",
+        "type": "follow-up",
+        "task_context": "project-checkin",
+        "platform": "whatsapp",
+        "timestamp": "2025-08-05T13:05:00Z"
+    }
+    base.update(overrides)
+    return base
+
+def _run(aggregator, items):
+    for item in items:
+        action_pipeline.action_pipeline(item, aggregator=aggregator)
+    return aggregator
+
+# ---------------------------
+# Sketches
+# ---------------------------
+def test_count_min_never_undercounts():
+    cms = action_analytics.CountMinSketch(width=64, depth=3)
+    for i in range(200):
+        cms.add(f"k{i % 20}")
+    for i in range(20):
+        assert cms.estimate(f"k{i}") >= 10
+
+def test_count_min_merge_requires_same_shape():
+    with pytest.raises(ValueError):
+        action_analytics.CountMinSketch(64, 3).merge(action_analytics.CountMinSketch(32, 3))
+
+def test_hyperloglog_estimate_within_error():
+    hll = action_analytics.HyperLogLog(precision=12)
+    for i in range(10000):
+        hll.add(f"user-{i}")
+    assert abs(hll.count() - 10000) / 10000 < 0.05
+
+def test_hyperloglog_merge_is_union():
+    a, b = action_analytics.HyperLogLog(10), action_analytics.HyperLogLog(10)
+    for i in range(500):
+        a.add(f"u{i}")
+        b.add(f"u{i + 250}")
+    assert abs(a.merge(b).count() - 750) / 750 < 0.1
+
+def test_sliding_window_expires_old_buckets():
+    window = action_analytics.SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+    window.add("x", 0)
+    window.add("x", 120)
+    window.add("y", 400)
+    assert window.counts() == {"x": 1, "y": 1}
+    # Events older than the window are dropped outright
+    window.add("x", 10)
+    assert window.counts()["x"] == 1
+
+# ---------------------------
+# Decision aggregation
+# ---------------------------
+def test_delay_bucket():
+    assert action_analytics.delay_bucket(0) == "immediate"
+    assert action_analytics.delay_bucket(30) == "<=30m"
+    assert action_analytics.delay_bucket(60) == "<=60m"
+    assert action_analytics.delay_bucket(120) == ">60m"
+
+def test_pipeline_records_dimensions():
+    agg = _run(action_analytics.DecisionAggregator(), [
+        _base_input(),
+        _base_input(user_id="u2", summary="Send it ASAP", platform="Slack"),
+        _base_input(user_id="u3", summary="Done, ignore", type="meeting", platform="email"),
+    ])
+    assert agg.total == 3
+    assert agg.counts("action_type") == {"respond": 2, "ignore": 1}
+    assert agg.counts("platform") == {"whatsapp": 1, "slack": 1, "email": 1}
+    assert agg.counts("delay_bucket") == {"<=60m": 1, "immediate": 2}
+    assert agg.counts("urgency") == {"normal": 2, "urgent": 1}
+    assert agg.distinct_users() == 3
+
+def test_unknown_dimension_raises():
+    with pytest.raises(ValueError):
+        action_analytics.DecisionAggregator().counts("colour")
+
+def test_top_summaries_per_context():
+    agg = action_analytics.DecisionAggregator(top_k=2)
+    items = (
+        [_base_input(summary="Status?")] * 5
+        + [_base_input(summary="Deck ready?")] * 3
+        + [_base_input(summary="One-off")]
+        + [_base_input(summary="Call at 5?", task_context="client-call")]
+    )
+    _run(agg, items)
+    top = agg.top_summaries_for("project-checkin")
+    assert [s for s, _ in top] == ["Status?", "Deck ready?"]
+    assert top[0][1] >= 5
+    assert agg.top_summaries_for("client-call")[0][0] == "Call at 5?"
+
+def test_snapshot_roundtrip_is_json_serialisable():
+    agg = _run(action_analytics.DecisionAggregator(), [_base_input(), _base_input(user_id="u2")])
+    restored = action_analytics.DecisionAggregator.from_snapshot(json.loads(json.dumps(agg.snapshot())))
+    assert restored.report() == agg.report()
+
+def test_merge_snapshots_matches_single_worker():
+    items = [
+        _base_input(user_id=f"u{i}", platform=["whatsapp", "email", "slack"][i % 3],
+                    timestamp=f"2025-08-05T13:{i:02d}:00Z")
+        for i in range(30)
+    ]
+    single = _run(action_analytics.DecisionAggregator(), items)
+    shard_a = _run(action_analytics.DecisionAggregator(), items[0::2])
+    shard_b = _run(action_analytics.DecisionAggregator(), items[1::2])
+    merged = action_analytics.merge_snapshots([shard_a.snapshot(), shard_b.snapshot()])
+    assert merged.report() == single.report()
+
+def test_merge_snapshots_empty_raises():
+    with pytest.raises(ValueError):
+        action_analytics.merge_snapshots([])
+
+# ---------------------------
+# Sliding window merge
+# ---------------------------
+def test_sliding_window_merge_same_slot_adds():
+    a = action_analytics.SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+    b = action_analytics.SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+    a.add("x", 60)
+    b.add("x", 90)
+    b.add("y", 120)
+    assert a.merge(b).counts() == {"x": 2, "y": 1}
+
+def test_sliding_window_merge_far_apart_keeps_newest_window():
+    old = action_analytics.SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+    new = action_analytics.SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+    old.add("x", 0)
+    new.add("y", 3600)
+    assert old.merge(new).counts() == {"y": 1}
+    assert all(index == -1 or index == 60 for index, _ in old.slots)
+
+def test_sliding_window_merge_other_older_is_ignored():
+    mine = action_analytics.SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+    stale = action_analytics.SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+    mine.add("y", 3600)
+    stale.add("x", 0)
+    assert mine.merge(stale).counts() == {"y": 1}
+
+# ---------------------------
+# Merge error paths
+# ---------------------------
+@pytest.mark.parametrize("kwargs", [
+    {"cms_width": 10},
+    {"hll_precision": 10},
+    {"bucket_seconds": 30},
+    {"top_k": 3},
+    {"max_contexts": 7},
+])
+def test_merge_mismatch_raises_without_mutating(kwargs):
+    target = _run(action_analytics.DecisionAggregator(), [_base_input()])
+    before = json.dumps(target.snapshot(), sort_keys=True)
+    other = _run(action_analytics.DecisionAggregator(**kwargs), [_base_input(user_id="u2")])
+    with pytest.raises(ValueError):
+        target.merge(other)
+    assert json.dumps(target.snapshot(), sort_keys=True) == before
+
+def test_from_dict_rejects_bad_lengths():
+    hll = action_analytics.HyperLogLog(8).to_dict()
+    hll["registers"] = hll["registers"][:-2]
+    with pytest.raises(ValueError):
+        action_analytics.HyperLogLog.from_dict(hll)
+
+    window = action_analytics.SlidingWindowCounter(300, 60).to_dict()
+    window["slots"] = window["slots"][:-1]
+    with pytest.raises(ValueError):
+        action_analytics.SlidingWindowCounter.from_dict(window)
+
+    cms = action_analytics.CountMinSketch(16, 2).to_dict()
+    cms["table"][0] = cms["table"][0][:-1]
+    with pytest.raises(ValueError):
+        action_analytics.CountMinSketch.from_dict(cms)
+
+# ---------------------------
+# Top summaries across merges
+# ---------------------------
+def test_merge_evicts_top_k_by_combined_counts():
+    a = _run(action_analytics.DecisionAggregator(top_k=1), [_base_input(summary="A")] * 3)
+    b = _run(action_analytics.DecisionAggregator(top_k=1), [_base_input(summary="B")] * 2)
+    c = _run(action_analytics.DecisionAggregator(top_k=1), [_base_input(summary="B")] * 2)
+    merged = a.merge(b).merge(c)
+    assert merged.top_summaries_for("project-checkin") == [("B", 4)]
+
+def test_merge_full_context_table_is_deterministic():
+    target = _run(action_analytics.DecisionAggregator(max_contexts=2), [_base_input(task_context="keep")])
+    other = _run(action_analytics.DecisionAggregator(max_contexts=2), [
+        _base_input(task_context="x1"),
+        _base_input(task_context="x2"),
+        _base_input(task_context="x2"),
+    ])
+    merged = target.merge(other)
+    # Existing context stays, then the heaviest new one wins the free slot
+    assert list(merged.top_summaries) == ["keep", "x2"]
+
+def test_merge_full_context_table_ties_break_by_name():
+    target = _run(action_analytics.DecisionAggregator(max_contexts=2), [_base_input(task_context="keep")])
+    other = _run(action_analytics.DecisionAggregator(max_contexts=2), [
+        _base_input(task_context="x2"),
+        _base_input(task_context="x1"),
+    ])
+    assert list(target.merge(other).top_summaries) == ["keep", "x1"]
+
+# ---------------------------
+# Input robustness
+# ---------------------------
+def test_numeric_timestamp_is_epoch():
+    agg = action_analytics.DecisionAggregator(window_seconds=300, bucket_seconds=60)
+    action_pipeline.action_pipeline(_base_input(timestamp=1754399100), aggregator=agg)
+    action_pipeline.action_pipeline(_base_input(timestamp=1754399100.5), aggregator=agg)
+    assert agg.counts("platform") == {"whatsapp": 2}
+    assert agg.window.latest_bucket == 1754399100 // 60
+
+@pytest.mark.parametrize("bad", [None, "", "not-a-date", ["2025"], {"t": 1}, True])
+def test_bad_timestamp_uses_event_clock(bad):
+    agg = action_analytics.DecisionAggregator()
+    _run(agg, [
+        _base_input(timestamp="2025-08-05T13:05:00Z"),
+        _base_input(timestamp=bad, platform="slack"),
+    ])
+    # Window stays on event time rather than jumping to wall-clock now
+    assert agg.counts("platform") == {"whatsapp": 1, "slack": 1}
+    assert agg.counts("platform", windowed=False) == {"whatsapp": 1, "slack": 1}
+
+def test_bad_timestamp_before_any_event_skips_window():
+    agg = _run(action_analytics.DecisionAggregator(), [_base_input(timestamp="garbage")])
+    assert agg.counts("platform") == {}
+    assert agg.counts("platform", windowed=False) == {"whatsapp": 1}
+
+def test_unknown_values_fold_into_other():
+    agg = _run(action_analytics.DecisionAggregator(), [
+        _base_input(platform=f"pager-{i}") for i in range(50)
+    ])
+    assert agg.counts("platform") == {"other": 50}
+    assert len(agg.totals) == len(action_analytics.DIMENSIONS)